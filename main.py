@@ -1,10 +1,11 @@
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response
 from pydantic import BaseModel
 import uvicorn
 from typing import List, Optional
 import os
+import orjson
 
 # Import routers
 from routers import auth, users, docs, agents
@@ -14,6 +15,7 @@ app = FastAPI(
     title="Studi API",
     description="API for Studi - AI-Powered Learning Assistant",
     version="0.1.0",
+    default_response_class=ORJSONResponse,
 )
 
 # Configure CORS
@@ -27,8 +29,10 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    # Explicit lists let Starlette answer preflights from a fixed set instead
+    # of echoing whatever the browser asks for
+    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_headers=["authorization", "content-type"],
 )
 
 # Include routers
@@ -37,44 +41,73 @@ app.include_router(users.router, prefix="/api/users", tags=["Users"])
 app.include_router(docs.router, prefix="/api/docs", tags=["Documentation"])
 app.include_router(agents.router, prefix="/api/agents", tags=["Agents"])
 
-# Root endpoint
-@app.get("/", tags=["Root"])
-async def root():
-    return {
+# Prebuilt responses for the constant endpoints below. The handlers stay
+# async so FastAPI calls them on the event loop instead of the threadpool.
+_ROOT_RESPONSE = Response(
+    content=orjson.dumps({
         "message": "Welcome to Studi API",
         "docs": "/docs",
         "redoc": "/redoc",
-    }
+    }),
+    media_type="application/json",
+)
+_HEALTH_RESPONSE = Response(
+    content=orjson.dumps({"status": "healthy"}),
+    media_type="application/json",
+)
+
+# Root endpoint
+@app.get("/", tags=["Root"])
+async def root():
+    return _ROOT_RESPONSE
 
 # Health check endpoint
 @app.get("/api/health", tags=["Health"])
 async def health_check():
-    return {"status": "healthy"}
+    return _HEALTH_RESPONSE
 
 # Error handlers
+# The 500 response never varies, so a single instance is reused. This is safe
+# because Starlette sends it from ServerErrorMiddleware, outside every user
+# middleware, so nothing mutates its headers.
+_INTERNAL_ERROR_RESPONSE = Response(
+    content=b'{"detail":"Internal server error"}',
+    status_code=500,
+    media_type="application/json",
+)
+
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
-    return JSONResponse(
+    return Response(
+        content=orjson.dumps({"detail": exc.detail}),
         status_code=exc.status_code,
-        content={"detail": exc.detail},
+        media_type="application/json",
     )
 
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
-    return JSONResponse(
-        status_code=500,
-        content={"detail": "Internal server error"},
-    )
+    return _INTERNAL_ERROR_RESPONSE
 
 if __name__ == "__main__":
     # Get port from environment variable or use default
     port = int(os.environ.get("PORT", 8000))
     
+    # Auto-reload is opt-in for development; it runs a single process
+    reload = bool(int(os.environ.get("RELOAD", "0")))
+    # A single worker by default: users and profiles live in per-process memory,
+    # so extra workers would each see different data until they move to a database
+    workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+    
     # Run the application
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=port,
-        reload=True,
-        log_level="info",
-    ) 
\ No newline at end of file
+        # "auto" picks uvloop where it is installed and asyncio elsewhere (Windows)
+        loop="auto",
+        http="httptools",
+        workers=1 if reload else workers,
+        reload=reload,
+        log_level="warning",
+        access_log=False,
+    )
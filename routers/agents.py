@@ -1,128 +1,191 @@
-from fastapi import APIRouter, HTTPException, Depends, status, WebSocket, WebSocketDisconnect
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Depends, status, Response, WebSocket, WebSocketDisconnect
 from typing import List, Optional, Dict, Any
-import json
 import asyncio
+import os
+import ahocorasick
+import msgspec
+import orjson
 from .auth import get_current_active_user, User
+from .utils import encoder, json_body, json_content, validated_body
 
 # Create router
 router = APIRouter()
 
 # Models
-class AgentQuery(BaseModel):
+class AgentQuery(msgspec.Struct):
     query: str
     context: Optional[Dict[str, Any]] = None
 
-class AgentResponse(BaseModel):
+class AgentResponse(msgspec.Struct):
     response: str
     sources: Optional[List[Dict[str, Any]]] = None
     context: Optional[Dict[str, Any]] = None
 
-class AgentPlan(BaseModel):
+class AgentPlan(msgspec.Struct):
     steps: List[Dict[str, Any]]
     context: Optional[Dict[str, Any]] = None
 
-class AgentTask(BaseModel):
+class AgentTask(msgspec.Struct):
     task_id: str
     status: str
     progress: float
     result: Optional[Dict[str, Any]] = None
 
+
+# The mock agent only sleeps when STUDI_SIMULATE_LATENCY=1, so load tests measure the server
+_SIMULATE_LATENCY = bool(int(os.environ.get("STUDI_SIMULATE_LATENCY", "0")))
+
+# Upper bound on agent work in flight, so bursts queue instead of starving the event loop
+_AGENT_CONCURRENCY = int(os.environ.get("AGENT_CONCURRENCY", "256"))
+_agent_semaphore: Optional[asyncio.Semaphore] = None
+
+def _get_agent_semaphore() -> asyncio.Semaphore:
+    # Created on first use rather than at import: before Python 3.10 a semaphore
+    # binds to the event loop current at construction, not the one serving requests
+    global _agent_semaphore
+    if _agent_semaphore is None:
+        _agent_semaphore = asyncio.Semaphore(_AGENT_CONCURRENCY)
+    return _agent_semaphore
+
+# Mock payloads that do not depend on the request, shared by every call
+_STUDY_GUIDE_BODY = encoder.encode(AgentResponse(
+    response="I've created a study guide for your topic. Here are the key points to focus on...",
+    sources=[
+        {"title": "Textbook Chapter 5", "url": "https://example.com/textbook/chapter5"},
+        {"title": "Lecture Notes Week 3", "url": "https://example.com/lectures/week3"}
+    ],
+    context={
+        "topic": "Machine Learning Fundamentals",
+        "created_at": "2023-06-15T10:30:00Z"
+    }
+))
+
+_ASSIGNMENT_BODY = encoder.encode(AgentResponse(
+    response="I'll help you with this assignment. Let's break it down step by step...",
+    sources=[
+        {"title": "Assignment Guidelines", "url": "https://example.com/assignments/guidelines"},
+        {"title": "Related Examples", "url": "https://example.com/examples"}
+    ],
+    context={
+        "assignment_type": "Problem Set",
+        "due_date": "2023-06-20T23:59:00Z"
+    }
+))
+
+# Only the response text varies per query
+_GENERIC_RESP = AgentResponse(
+    response="",
+    sources=[],
+    context={
+        "query_type": "general",
+        "timestamp": "2023-06-15T10:30:00Z"
+    }
+)
+
+# Keyword matcher - a single pass over the query finds every trigger phrase.
+# Automaton values index into _KEYWORD_RESPONSES; the lowest index wins when a
+# query contains several keywords.
+_KEYWORD_RESPONSES = [
+    ("study guide", _STUDY_GUIDE_BODY),
+    ("assignment", _ASSIGNMENT_BODY),
+]
+_keyword_automaton = ahocorasick.Automaton()
+for _index, (_keyword, _) in enumerate(_KEYWORD_RESPONSES):
+    _keyword_automaton.add_word(_keyword, _index)
+_keyword_automaton.make_automaton()
+
+# Encode-only twin of AgentPlan whose steps are already-encoded JSON
+class _EncodedPlan(msgspec.Struct):
+    steps: msgspec.Raw
+    context: Optional[Dict[str, Any]] = None
+
+# Embedded as pre-encoded JSON in every plan
+_PLAN_STEPS = msgspec.Raw(encoder.encode([
+    {
+        "step_id": "1",
+        "description": "Analyze the query and identify key topics",
+        "status": "completed"
+    },
+    {
+        "step_id": "2",
+        "description": "Retrieve relevant information from knowledge base",
+        "status": "in_progress"
+    },
+    {
+        "step_id": "3",
+        "description": "Generate comprehensive response",
+        "status": "pending"
+    },
+    {
+        "step_id": "4",
+        "description": "Review and refine response for accuracy",
+        "status": "pending"
+    }
+]))
+
 # Mock agent responses - in a real app, this would call the actual agent system
-async def mock_agent_response(query: str, context: Optional[Dict[str, Any]] = None):
-    # Simulate processing time
-    await asyncio.sleep(1)
-    
-    # Simple response logic based on query keywords
-    if "study guide" in query.lower():
-        return {
-            "response": "I've created a study guide for your topic. Here are the key points to focus on...",
-            "sources": [
-                {"title": "Textbook Chapter 5", "url": "https://example.com/textbook/chapter5"},
-                {"title": "Lecture Notes Week 3", "url": "https://example.com/lectures/week3"}
-            ],
-            "context": {
-                "topic": "Machine Learning Fundamentals",
-                "created_at": "2023-06-15T10:30:00Z"
-            }
-        }
-    elif "assignment" in query.lower():
-        return {
-            "response": "I'll help you with this assignment. Let's break it down step by step...",
-            "sources": [
-                {"title": "Assignment Guidelines", "url": "https://example.com/assignments/guidelines"},
-                {"title": "Related Examples", "url": "https://example.com/examples"}
-            ],
-            "context": {
-                "assignment_type": "Problem Set",
-                "due_date": "2023-06-20T23:59:00Z"
-            }
-        }
-    else:
-        return {
-            "response": f"I understand you're asking about: {query}. How can I help you with this topic?",
-            "sources": [],
-            "context": {
-                "query_type": "general",
-                "timestamp": "2023-06-15T10:30:00Z"
-            }
-        }
+# Returns the AgentResponse already encoded as JSON
+async def mock_agent_response(query: str, context: Optional[Dict[str, Any]] = None) -> bytes:
+    async with _get_agent_semaphore():
+        # Simulate processing time
+        if _SIMULATE_LATENCY:
+            await asyncio.sleep(1)
+        
+        # Simple response logic based on query keywords
+        match = min((index for _, index in _keyword_automaton.iter(query.lower())), default=None)
+        if match is not None:
+            return _KEYWORD_RESPONSES[match][1]
+        return encoder.encode(msgspec.structs.replace(
+            _GENERIC_RESP,
+            response=f"I understand you're asking about: {query}. How can I help you with this topic?"
+        ))
 
 # Routes
-@router.post("/query", response_model=AgentResponse)
+@router.post(
+    "/query",
+    responses={200: {"content": json_content(AgentResponse)}},
+    openapi_extra=json_body(AgentQuery)
+)
 async def query_agent(
-    query: AgentQuery,
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_active_user),
+    query: AgentQuery = Depends(validated_body(AgentQuery))
 ):
     """
     Send a query to the agent system and get a response.
     """
     response = await mock_agent_response(query.query, query.context)
-    return response
+    return Response(content=response, media_type="application/json")
 
-@router.post("/plan", response_model=AgentPlan)
+@router.post(
+    "/plan",
+    responses={200: {"content": json_content(AgentPlan)}},
+    openapi_extra=json_body(AgentQuery)
+)
 async def create_plan(
-    query: AgentQuery,
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_active_user),
+    query: AgentQuery = Depends(validated_body(AgentQuery))
 ):
     """
     Create a plan for a complex task.
     """
-    # Simulate processing time
-    await asyncio.sleep(1.5)
-    
-    # Mock plan creation
-    return {
-        "steps": [
-            {
-                "step_id": "1",
-                "description": "Analyze the query and identify key topics",
-                "status": "completed"
-            },
-            {
-                "step_id": "2",
-                "description": "Retrieve relevant information from knowledge base",
-                "status": "in_progress"
-            },
-            {
-                "step_id": "3",
-                "description": "Generate comprehensive response",
-                "status": "pending"
-            },
-            {
-                "step_id": "4",
-                "description": "Review and refine response for accuracy",
-                "status": "pending"
+    async with _get_agent_semaphore():
+        # Simulate processing time
+        if _SIMULATE_LATENCY:
+            await asyncio.sleep(1.5)
+        
+        # Mock plan creation
+        plan = _EncodedPlan(
+            steps=_PLAN_STEPS,
+            context={
+                "query": query.query,
+                "plan_id": "plan-123456",
+                "created_at": "2023-06-15T10:30:00Z"
             }
-        ],
-        "context": {
-            "query": query.query,
-            "plan_id": "plan-123456",
-            "created_at": "2023-06-15T10:30:00Z"
-        }
-    }
+        )
+        content = encoder.encode(plan)
+    return Response(content=content, media_type="application/json")
 
-@router.get("/tasks/{task_id}", response_model=AgentTask)
+@router.get("/tasks/{task_id}", responses={200: {"content": json_content(AgentTask)}})
 async def get_task_status(
     task_id: str,
     current_user: User = Depends(get_current_active_user)
@@ -131,41 +194,117 @@ async def get_task_status(
     Get the status of a long-running task.
     """
     # Mock task status
-    return {
-        "task_id": task_id,
-        "status": "in_progress",
-        "progress": 0.65,
-        "result": None
-    }
+    task = AgentTask(
+        task_id=task_id,
+        status="in_progress",
+        progress=0.65,
+        result=None
+    )
+    return Response(content=encoder.encode(task), media_type="application/json")
 
 # WebSocket endpoint for real-time agent interaction
+# Replies are coalesced: every frame sent to the client is a JSON array holding
+# one or more replies (up to _WS_MAX_BATCH), always in the order the messages
+# were received.
+_WS_MAX_BATCH = 128
+
+# Messages a single connection may have in flight; the next message is not read
+# until a reply has been sent, so one client cannot take every agent slot
+_WS_MAX_IN_FLIGHT = 32
+
+_WS_INVALID_JSON = encoder.encode({"error": "Invalid JSON format"})
+
+def _ws_error(e: Exception) -> bytes:
+    return encoder.encode({"error": f"Error processing request: {str(e)}"})
+
+def _ws_ready(reply: bytes) -> asyncio.Future:
+    future = asyncio.get_running_loop().create_future()
+    future.set_result(reply)
+    return future
+
+async def _ws_reply(query: str, context: Optional[Dict[str, Any]]) -> bytes:
+    try:
+        return await mock_agent_response(query, context)
+    except Exception as e:
+        return _ws_error(e)
+
+async def _ws_receiver(websocket: WebSocket, replies: asyncio.Queue, slots: asyncio.Semaphore):
+    while True:
+        await slots.acquire()
+        
+        # Receive message from client
+        data = await websocket.receive_text()
+        
+        # Parse the message
+        try:
+            message = orjson.loads(data)
+            query = message.get("query", "")
+            context = message.get("context", {})
+        except orjson.JSONDecodeError:
+            replies.put_nowait(_ws_ready(_WS_INVALID_JSON))
+            continue
+        except Exception as e:
+            replies.put_nowait(_ws_ready(_ws_error(e)))
+            continue
+        
+        # Process the query in the background; the sender delivers the reply
+        replies.put_nowait(asyncio.create_task(_ws_reply(query, context)))
+
+async def _ws_sender(websocket: WebSocket, replies: asyncio.Queue, slots: asyncio.Semaphore):
+    head = None
+    try:
+        while True:
+            # Wait for the oldest unanswered message, then take along the replies
+            # behind it that are already finished. Stopping at the first one still
+            # running keeps replies in message order.
+            if head is None:
+                head = await replies.get()
+            batch = [await head]
+            head = None
+            while len(batch) < _WS_MAX_BATCH and not replies.empty():
+                reply = replies.get_nowait()
+                if not reply.done():
+                    head = reply
+                    break
+                batch.append(reply.result())
+            
+            # Replies are already-encoded JSON, so the frame is just their concatenation
+            await websocket.send_text((b"[" + b",".join(batch) + b"]").decode())
+            for _ in batch:
+                slots.release()
+    finally:
+        if head is not None:
+            head.cancel()
+
 @router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
+    """
+    Real-time agent interaction.
+
+    Clients send one JSON object per message ({"query": ..., "context": ...}).
+    Replies arrive as JSON arrays of agent responses or {"error": ...} objects,
+    in message order, so a single frame may answer several messages.
+
+    Messages are parsed with orjson, which requires valid UTF-8: strings with
+    unpaired surrogates (raw or \\u-escaped) are rejected as invalid JSON,
+    where the stdlib json module would have accepted them.
+    """
     await websocket.accept()
+    replies: asyncio.Queue = asyncio.Queue()
+    slots = asyncio.Semaphore(_WS_MAX_IN_FLIGHT)
+    receiver = asyncio.create_task(_ws_receiver(websocket, replies, slots))
+    sender = asyncio.create_task(_ws_sender(websocket, replies, slots))
     try:
-        while True:
-            # Receive message from client
-            data = await websocket.receive_text()
-            
-            # Parse the message
-            try:
-                message = json.loads(data)
-                query = message.get("query", "")
-                context = message.get("context", {})
-                
-                # Process the query
-                response = await mock_agent_response(query, context)
-                
-                # Send response back to client
-                await websocket.send_json(response)
-            except json.JSONDecodeError:
-                await websocket.send_json({
-                    "error": "Invalid JSON format"
-                })
-            except Exception as e:
-                await websocket.send_json({
-                    "error": f"Error processing request: {str(e)}"
-                })
-    except WebSocketDisconnect:
-        # Handle disconnect
-        pass 
\ No newline at end of file
+        # The session ends when the client disconnects or a send fails
+        done, _ = await asyncio.wait({receiver, sender}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        receiver.cancel()
+        sender.cancel()
+        while not replies.empty():
+            replies.get_nowait().cancel()
+        await asyncio.gather(receiver, sender, return_exceptions=True)
+    
+    for task in done:
+        error = task.exception()
+        if error is not None and not isinstance(error, WebSocketDisconnect):
+            raise error
@@ -1,34 +1,40 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, status, Response
+from fastapi.responses import HTMLResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Dict, List, Optional, Tuple
+from collections import OrderedDict
+import asyncio
 import os
 import markdown
+import msgspec
 from .auth import get_current_active_user, User
+from .utils import encoder, json_content
 
 # Create router
 router = APIRouter()
 
 # Models
-class DocCategory(BaseModel):
+class DocCategory(msgspec.Struct):
     id: str
     name: str
     description: str
     icon: str
 
-class DocItem(BaseModel):
+class DocItem(msgspec.Struct):
     id: str
     category_id: str
     title: str
     path: str
     summary: Optional[str] = None
 
-class DocContent(BaseModel):
+class DocContent(msgspec.Struct):
     id: str
     title: str
     content: str
     toc: List[dict]
     last_updated: str
 
+
 # Mock database - in a real app, this would be a database
 doc_categories = [
     {
@@ -142,6 +148,14 @@ doc_items = [
     }
 ]
 
+# Lookup indexes over doc_items, so searches do not rescan every item
+_ITEMS_BY_CATEGORY: Dict[str, List[dict]] = {}
+for _item in doc_items:
+    _ITEMS_BY_CATEGORY.setdefault(_item["category_id"], []).append(_item)
+
+_LC_TITLES = [item["title"].lower() for item in doc_items]
+_LC_SUMMARIES = [(item.get("summary") or "").lower() for item in doc_items]
+
 # Mock document content - in a real app, this would be read from files
 doc_content = {
     "architecture-overview": {
@@ -184,24 +198,82 @@ User <-> Web App <-> API Gateway <-> Agent System <-> Memory System
     }
 }
 
+# Responses for the fixed mock listings
+def _json_response(obj) -> Response:
+    return Response(content=encoder.encode(obj), media_type="application/json")
+
+_CATEGORIES_RESPONSE = _json_response(doc_categories)
+_ITEMS_RESPONSE = _json_response(doc_items)
+_EMPTY_ITEMS_RESPONSE = _json_response([])
+_ITEMS_BY_CATEGORY_RESPONSES = {
+    category_id: _json_response(items) for category_id, items in _ITEMS_BY_CATEGORY.items()
+}
+
+# Loaded document cache - the encoded JSON and the rendered HTML of a document
+# are cached as separate entries, keyed by (doc_id, format), so the JSON
+# endpoint never runs the Markdown parser. Concurrent requests for an entry
+# that is not cached yet share a single load, and only the most recently used
+# entries are kept.
+_DOC_CACHE_SIZE = int(os.environ.get("DOC_CACHE_SIZE", "128"))
+_doc_cache: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+# Locks for loads in progress only - dropped once the load finishes
+_doc_locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+
+# In a real app, these would read the Markdown file from disk
+def _encode_doc(doc_id: str) -> bytes:
+    return encoder.encode(doc_content[doc_id])
+
+def _render_doc_html(doc_id: str) -> bytes:
+    # The toc extension gives headings the same ids as the entries in "toc"
+    html = markdown.markdown(doc_content[doc_id]["content"], extensions=["fenced_code", "toc"])
+    return html.encode()
+
+_DOC_LOADERS = {
+    "json": _encode_doc,
+    "html": _render_doc_html,
+}
+
+async def _load_doc(doc_id: str, fmt: str) -> bytes:
+    key = (doc_id, fmt)
+    cached = _doc_cache.get(key)
+    if cached is not None:
+        _doc_cache.move_to_end(key)
+        return cached
+    
+    lock = _doc_locks.setdefault(key, asyncio.Lock())
+    try:
+        async with lock:
+            # Another request may have loaded it while we waited for the lock
+            cached = _doc_cache.get(key)
+            if cached is None:
+                cached = await run_in_threadpool(_DOC_LOADERS[fmt], doc_id)
+                _doc_cache[key] = cached
+                if len(_doc_cache) > _DOC_CACHE_SIZE:
+                    _doc_cache.popitem(last=False)
+    finally:
+        # Requests already waiting keep their reference; later ones hit the cache
+        if _doc_locks.get(key) is lock:
+            del _doc_locks[key]
+    return cached
+
 # Routes
-@router.get("/categories", response_model=List[DocCategory])
+@router.get("/categories", responses={200: {"content": json_content(List[DocCategory])}})
 async def get_doc_categories():
     """
     Get all documentation categories.
     """
-    return doc_categories
+    return _CATEGORIES_RESPONSE
 
-@router.get("/items", response_model=List[DocItem])
+@router.get("/items", responses={200: {"content": json_content(List[DocItem])}})
 async def get_doc_items(category_id: Optional[str] = None):
     """
     Get documentation items, optionally filtered by category.
     """
     if category_id:
-        return [item for item in doc_items if item["category_id"] == category_id]
-    return doc_items
+        return _ITEMS_BY_CATEGORY_RESPONSES.get(category_id, _EMPTY_ITEMS_RESPONSE)
+    return _ITEMS_RESPONSE
 
-@router.get("/content/{doc_id}", response_model=DocContent)
+@router.get("/content/{doc_id}", responses={200: {"content": json_content(DocContent)}})
 async def get_doc_content(doc_id: str):
     """
     Get the content of a specific documentation item.
@@ -214,7 +286,22 @@ async def get_doc_content(doc_id: str):
             detail=f"Document with ID {doc_id} not found"
         )
     
-    return doc_content[doc_id]
+    content = await _load_doc(doc_id, "json")
+    return Response(content=content, media_type="application/json")
+
+@router.get("/content/{doc_id}/html", response_class=HTMLResponse)
+async def get_doc_html(doc_id: str):
+    """
+    Get the content of a specific documentation item rendered as HTML.
+    """
+    if doc_id not in doc_content:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Document with ID {doc_id} not found"
+        )
+    
+    html = await _load_doc(doc_id, "html")
+    return HTMLResponse(content=html)
 
 @router.get("/search")
 async def search_docs(query: str):
@@ -223,13 +310,9 @@ async def search_docs(query: str):
     """
     # In a real app, this would perform a full-text search
     # For now, just do a simple string match on titles and summaries
-    results = []
-    
-    for item in doc_items:
-        if (
-            query.lower() in item["title"].lower() or 
-            (item.get("summary") and query.lower() in item["summary"].lower())
-        ):
-            results.append(item)
-    
-    return results 
\ No newline at end of file
+    q = query.lower()
+    return [
+        doc_items[i]
+        for i, (title, summary) in enumerate(zip(_LC_TITLES, _LC_SUMMARIES))
+        if q in title or (summary and q in summary)
+    ]
@@ -1,13 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Depends, status, Response
 from typing import List, Optional
+import msgspec
 from .auth import get_current_active_user, User
+from .utils import encoder, json_body, json_content, validated_body
 
 # Create router
 router = APIRouter()
 
 # Models
-class UserProfile(BaseModel):
+class UserProfile(msgspec.Struct):
     username: str
     email: Optional[str] = None
     full_name: Optional[str] = None
@@ -15,13 +16,14 @@ class UserProfile(BaseModel):
     avatar_url: Optional[str] = None
     preferences: Optional[dict] = None
 
-class UserProfileUpdate(BaseModel):
+class UserProfileUpdate(msgspec.Struct):
     email: Optional[str] = None
     full_name: Optional[str] = None
     bio: Optional[str] = None
     avatar_url: Optional[str] = None
     preferences: Optional[dict] = None
 
+
 # Mock database - in a real app, this would be a database
 fake_profiles_db = {
     "johndoe": {
@@ -38,92 +40,75 @@ fake_profiles_db = {
     }
 }
 
+# Helper functions
+def _default_preferences() -> dict:
+    return {
+        "theme": "light",
+        "notifications": True,
+        "study_reminder": False
+    }
+
+def _default_profile(user: User, preferences: Optional[dict] = None) -> dict:
+    return {
+        "username": user.username,
+        "email": user.email,
+        "full_name": user.full_name,
+        "bio": None,
+        "avatar_url": None,
+        "preferences": _default_preferences() if preferences is None else preferences
+    }
+
 # Routes
-@router.get("/profile", response_model=UserProfile)
+@router.get("/profile", responses={200: {"content": json_content(UserProfile)}})
 async def get_user_profile(current_user: User = Depends(get_current_active_user)):
     """
     Get the current user's profile.
     """
-    if current_user.username not in fake_profiles_db:
-        # Create a default profile if it doesn't exist
-        fake_profiles_db[current_user.username] = {
-            "username": current_user.username,
-            "email": current_user.email,
-            "full_name": current_user.full_name,
-            "bio": None,
-            "avatar_url": None,
-            "preferences": {
-                "theme": "light",
-                "notifications": True,
-                "study_reminder": False
-            }
-        }
+    # Create a default profile if it doesn't exist
+    profile = fake_profiles_db.get(current_user.username)
+    if profile is None:
+        profile = fake_profiles_db.setdefault(current_user.username, _default_profile(current_user))
     
-    return fake_profiles_db[current_user.username]
+    return Response(content=encoder.encode(profile), media_type="application/json")
 
-@router.put("/profile", response_model=UserProfile)
+@router.put(
+    "/profile",
+    responses={200: {"content": json_content(UserProfile)}},
+    openapi_extra=json_body(UserProfileUpdate)
+)
 async def update_user_profile(
-    profile_update: UserProfileUpdate,
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_active_user),
+    profile_update: UserProfileUpdate = Depends(validated_body(UserProfileUpdate))
 ):
     """
     Update the current user's profile.
     """
     # Get existing profile or create default
-    if current_user.username not in fake_profiles_db:
-        fake_profiles_db[current_user.username] = {
-            "username": current_user.username,
-            "email": current_user.email,
-            "full_name": current_user.full_name,
-            "bio": None,
-            "avatar_url": None,
-            "preferences": {
-                "theme": "light",
-                "notifications": True,
-                "study_reminder": False
-            }
-        }
-    
-    # Update profile with new values
-    current_profile = fake_profiles_db[current_user.username]
+    profile = fake_profiles_db.get(current_user.username)
+    if profile is None:
+        profile = fake_profiles_db.setdefault(current_user.username, _default_profile(current_user))
     
-    if profile_update.email is not None:
-        current_profile["email"] = profile_update.email
+    # Update profile with the fields that were provided
+    patch = {k: v for k, v in msgspec.structs.asdict(profile_update).items() if v is not None}
+    preferences = patch.pop("preferences", None)
+    profile.update(patch)
     
-    if profile_update.full_name is not None:
-        current_profile["full_name"] = profile_update.full_name
-    
-    if profile_update.bio is not None:
-        current_profile["bio"] = profile_update.bio
-    
-    if profile_update.avatar_url is not None:
-        current_profile["avatar_url"] = profile_update.avatar_url
-    
-    if profile_update.preferences is not None:
+    if preferences is not None:
         # Merge preferences instead of replacing
-        if "preferences" not in current_profile:
-            current_profile["preferences"] = {}
-        
-        current_profile["preferences"].update(profile_update.preferences)
-    
-    # Save updated profile
-    fake_profiles_db[current_user.username] = current_profile
+        profile.setdefault("preferences", {}).update(preferences)
     
-    return current_profile
+    return Response(content=encoder.encode(profile), media_type="application/json")
 
 @router.get("/preferences")
 async def get_user_preferences(current_user: User = Depends(get_current_active_user)):
     """
     Get the current user's preferences.
     """
-    if current_user.username not in fake_profiles_db:
-        return {
-            "theme": "light",
-            "notifications": True,
-            "study_reminder": False
-        }
+    profile = fake_profiles_db.get(current_user.username)
+    if profile is None:
+        return _default_preferences()
     
-    return fake_profiles_db[current_user.username].get("preferences", {})
+    return profile.get("preferences", {})
 
 @router.put("/preferences")
 async def update_user_preferences(
@@ -134,20 +119,14 @@ async def update_user_preferences(
     Update the current user's preferences.
     """
     # Get existing profile or create default
-    if current_user.username not in fake_profiles_db:
-        fake_profiles_db[current_user.username] = {
-            "username": current_user.username,
-            "email": current_user.email,
-            "full_name": current_user.full_name,
-            "bio": None,
-            "avatar_url": None,
-            "preferences": {}
-        }
+    profile = fake_profiles_db.get(current_user.username)
+    if profile is None:
+        profile = fake_profiles_db.setdefault(
+            current_user.username, _default_profile(current_user, preferences={})
+        )
     
     # Update preferences
-    if "preferences" not in fake_profiles_db[current_user.username]:
-        fake_profiles_db[current_user.username]["preferences"] = {}
-    
-    fake_profiles_db[current_user.username]["preferences"].update(preferences)
+    current_preferences = profile.setdefault("preferences", {})
+    current_preferences.update(preferences)
     
-    return fake_profiles_db[current_user.username]["preferences"] 
\ No newline at end of file
+    return current_preferences
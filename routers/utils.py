@@ -0,0 +1,147 @@
+from fastapi import HTTPException, Request, status
+from typing import Any, Callable, Dict, List, Type, Union
+import re
+import msgspec
+
+# Compiled JSON decoders, keyed by the Struct type they validate
+_DECODERS: Dict[Type[Any], msgspec.json.Decoder] = {}
+
+def get_decoder(model: Type[Any]) -> msgspec.json.Decoder:
+    """
+    Get the cached JSON decoder for a model, compiling it on first use.
+    """
+    decoder = _DECODERS.get(model)
+    if decoder is None:
+        decoder = _DECODERS[model] = msgspec.json.Decoder(model)
+    return decoder
+
+# Shared JSON encoder for Struct responses; msgspec encoders are stateless and reusable
+encoder = msgspec.json.Encoder()
+
+# Pieces of msgspec error messages, e.g. "... - at `$.inner.tags[0]`"
+_PATH_SEGMENT = re.compile(r"\.([^.\[]+)|\[(\d+)\]")
+_MISSING_FIELD = re.compile(r"^Object missing required field `(.+)`$")
+_BYTE_OFFSET = re.compile(r"\(byte (\d+)\)$")
+
+def _error_loc(path: str) -> List[Union[str, int]]:
+    return [name or int(index) for name, index in _PATH_SEGMENT.findall(path)]
+
+def _validation_detail(error: msgspec.DecodeError, body: bytes) -> List[Dict[str, Any]]:
+    """
+    Translate a msgspec decode error into FastAPI's validation error list.
+    """
+    if not body:
+        return [{"loc": ["body"], "msg": "field required", "type": "value_error.missing"}]
+    
+    message = str(error)
+    if not isinstance(error, msgspec.ValidationError):
+        # Malformed JSON rather than a schema mismatch
+        offset = _BYTE_OFFSET.search(message)
+        loc = ["body", int(offset.group(1))] if offset else ["body"]
+        return [{"loc": loc, "msg": message, "type": "value_error.jsondecode"}]
+    
+    message, _, path = message.partition(" - at `")
+    loc = ["body", *_error_loc(path.rstrip("`"))]
+    missing = _MISSING_FIELD.match(message)
+    if missing:
+        return [{"loc": loc + [missing.group(1)], "msg": "field required", "type": "value_error.missing"}]
+    return [{"loc": loc, "msg": message, "type": "type_error"}]
+
+_NULL_SCHEMA = {"type": "null"}
+
+# FastAPI's 422 body, as produced by validated_body
+_VALIDATION_ERROR_SCHEMA = {
+    "title": "HTTPValidationError",
+    "type": "object",
+    "properties": {
+        "detail": {
+            "type": "array",
+            "items": {
+                "title": "ValidationError",
+                "required": ["loc", "msg", "type"],
+                "type": "object",
+                "properties": {
+                    "loc": {
+                        "type": "array",
+                        "items": {"anyOf": [{"type": "string"}, {"type": "integer"}]}
+                    },
+                    "msg": {"type": "string"},
+                    "type": {"type": "string"}
+                }
+            }
+        }
+    }
+}
+
+def _to_openapi(node: Any, components: Dict[str, Any]) -> Any:
+    # Inline $refs and turn JSON Schema nullables ({"anyOf": [X, {"type": "null"}]})
+    # into OpenAPI 3.0's X + "nullable": true, since 3.0 has no "null" type
+    if isinstance(node, dict):
+        ref = node.get("$ref")
+        if ref is not None:
+            return _to_openapi(components[ref.rsplit("/", 1)[-1]], components)
+        variants = node.get("anyOf")
+        if variants is not None and _NULL_SCHEMA in variants:
+            rest = {key: value for key, value in node.items() if key != "anyOf"}
+            variants = [variant for variant in variants if variant != _NULL_SCHEMA]
+            if len(variants) == 1:
+                schema = {**_to_openapi(variants[0], components), **_to_openapi(rest, components)}
+            else:
+                schema = _to_openapi({**rest, "anyOf": variants}, components)
+            schema["nullable"] = True
+            return schema
+        # OpenAPI 3.0 requires "required" to be non-empty when present
+        return {
+            key: _to_openapi(value, components)
+            for key, value in node.items()
+            if not (key == "required" and value == [])
+        }
+    if isinstance(node, list):
+        return [_to_openapi(value, components) for value in node]
+    return node
+
+def json_content(tp: Any) -> Dict[str, Any]:
+    """
+    Build an OpenAPI content entry describing a JSON body of type `tp`.
+
+    Used in `responses` / `openapi_extra` so routes can document msgspec types
+    without a Pydantic response_model. Nested Struct references are inlined and
+    the schema is converted to the OpenAPI 3.0 dialect FastAPI emits.
+    """
+    (schema,), components = msgspec.json.schema_components([tp])
+    return {"application/json": {"schema": _to_openapi(schema, components)}}
+
+def json_body(tp: Any) -> Dict[str, Any]:
+    """
+    Build an `openapi_extra` entry documenting a required JSON request body
+    and the 422 response validated_body returns when it does not match.
+    """
+    return {
+        "requestBody": {"required": True, "content": json_content(tp)},
+        "responses": {
+            "422": {
+                "description": "Validation Error",
+                "content": {"application/json": {"schema": _VALIDATION_ERROR_SCHEMA}}
+            }
+        }
+    }
+
+def validated_body(model: Type[Any]) -> Callable:
+    """
+    Build a dependency that decodes and validates the raw request body as `model`.
+
+    The decoder is compiled here, when the route is declared at import time,
+    so the first request does not pay for building it.
+    """
+    decoder = get_decoder(model)
+
+    async def dependency(request: Request):
+        body = await request.body()
+        try:
+            return decoder.decode(body)
+        except msgspec.DecodeError as e:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=_validation_detail(e, body)
+            )
+    return dependency
@@ -0,0 +1,66 @@
+from typing import Any, Dict, List, Optional
+
+import msgspec
+import pytest
+
+from routers.utils import _validation_detail
+
+
+class Inner(msgspec.Struct):
+    query: str
+    context: Optional[Dict[str, Any]] = None
+    tags: Optional[List[str]] = None
+
+
+class Outer(msgspec.Struct):
+    inner: Inner
+
+
+def detail_for(model, body: bytes):
+    # Decode with a real msgspec decoder so the tests break if msgspec changes
+    # the error messages _validation_detail parses
+    with pytest.raises(msgspec.DecodeError) as excinfo:
+        msgspec.json.Decoder(model).decode(body)
+    return _validation_detail(excinfo.value, body)
+
+
+def test_missing_field():
+    assert detail_for(Inner, b"{}") == [
+        {"loc": ["body", "query"], "msg": "field required", "type": "value_error.missing"}
+    ]
+
+
+def test_missing_nested_field():
+    assert detail_for(Outer, b'{"inner": {}}') == [
+        {"loc": ["body", "inner", "query"], "msg": "field required", "type": "value_error.missing"}
+    ]
+
+
+def test_wrong_type():
+    assert detail_for(Inner, b'{"query": 1}') == [
+        {"loc": ["body", "query"], "msg": "Expected `str`, got `int`", "type": "type_error"}
+    ]
+
+
+def test_wrong_type_in_nested_list():
+    [error] = detail_for(Outer, b'{"inner": {"query": "a", "tags": ["x", 2]}}')
+    assert error["loc"] == ["body", "inner", "tags", 1]
+    assert error["type"] == "type_error"
+
+
+def test_wrong_top_level_type():
+    [error] = detail_for(Inner, b"[]")
+    assert error["loc"] == ["body"]
+    assert error["type"] == "type_error"
+
+
+def test_malformed_json():
+    [error] = detail_for(Inner, b"{bad")
+    assert error["loc"] == ["body", 1]
+    assert error["type"] == "value_error.jsondecode"
+
+
+def test_empty_body():
+    assert detail_for(Inner, b"") == [
+        {"loc": ["body"], "msg": "field required", "type": "value_error.missing"}
+    ]